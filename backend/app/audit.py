@@ -0,0 +1,90 @@
+"""Append-only audit log of invoice edits.
+
+Every field an edit actually changes is written to `invoice_history` as one
+row (old and new value as text) in the same transaction as the edit itself.
+Rows are never updated or deleted, so any past state of an invoice can be
+rebuilt by undoing the newer changes on top of the current row.
+"""
+
+from datetime import date, datetime
+from typing import Any, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models import Invoice, InvoiceHistory
+from app.schemas import InvoiceUpdateRequest
+
+# Fields whose history is logged: everything editable through the API
+TRACKED_FIELDS = tuple(InvoiceUpdateRequest.model_fields)
+
+
+def encode_value(value: Any) -> Optional[str]:
+    """Text form of a field value as stored in the log (parsed back by the Pydantic schemas)."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, date):
+        return value.isoformat()
+    # Decimal, str, int
+    return str(value)
+
+
+def apply_changes(
+    db: Session,
+    inv: Invoice,
+    update_data: dict[str, Any],
+    actor: str,
+) -> int:
+    """
+    Apply `update_data` to `inv` and queue one history row per changed field.
+
+    The history rows are added with a single batched INSERT; the caller
+    commits both together.  Returns the number of fields that were set.
+    """
+    changed_at = datetime.utcnow()
+    entries: list[dict[str, Any]] = []
+    count = 0
+
+    for key, value in update_data.items():
+        if not hasattr(inv, key):
+            continue
+        old = getattr(inv, key)
+        if old != value:
+            entries.append({
+                "invoice_id": inv.id,
+                "changed_at": changed_at,
+                "actor": actor,
+                "field": key,
+                "old_value": encode_value(old),
+                "new_value": encode_value(value),
+            })
+        setattr(inv, key, value)
+        count += 1
+
+    if entries:
+        db.execute(insert(InvoiceHistory), entries)
+    return count
+
+
+def invoice_as_of(db: Session, inv: Invoice, at: datetime) -> dict[str, Any]:
+    """
+    Reconstruct the tracked fields of `inv` as they were at time `at` (UTC).
+
+    Starts from the current row and rolls back every logged change made
+    after `at`, newest first.  Values restored from the log are strings.
+    Only `TRACKED_FIELDS` are returned; changes made outside the API (e.g.
+    by the n8n workflow) are not in the log and show their current value.
+    """
+    state = {field: getattr(inv, field) for field in TRACKED_FIELDS}
+
+    newer = (
+        db.query(InvoiceHistory.field, InvoiceHistory.old_value)
+        .filter(InvoiceHistory.invoice_id == inv.id, InvoiceHistory.changed_at > at)
+        .order_by(InvoiceHistory.changed_at.desc(), InvoiceHistory.id.desc())
+        .all()
+    )
+    for field, old_value in newer:
+        state[field] = old_value
+    return state
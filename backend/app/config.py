@@ -15,6 +15,15 @@ class Settings(BaseSettings):
     # PDF root directory
     pdf_root: str = "/data/pdfs"
 
+    # Find files outside the sharded/flat layout (ad-hoc sub-directories) via a
+    # cached file-name index of PDF_ROOT; disable once the migration is done
+    pdf_legacy_search: bool = True
+    # Seconds before the legacy file-name index is rebuilt on a lookup miss
+    pdf_legacy_index_ttl: int = 60
+
+    # Duplicate detection: minimum similarity score (0–1) for a candidate
+    duplicate_threshold: float = 0.85
+
     # Optional API key
     api_key: Optional[str] = None
 
@@ -0,0 +1,363 @@
+"""Duplicate-invoice detection.
+
+The same invoice often arrives twice (e-mail and Telegram) with different
+file hashes.  Instead of comparing every pair of invoices we build blocking
+keys from the structured fields – any two of supplier, invoice date and
+gross total must agree – and only compare invoices within the same block.
+
+Inside a block, `invoice_number` (after folding OCR look-alikes such as
+O/0) and `ocr_text` are compared as hashed character-trigram vectors, so
+one matrix product yields all pairwise cosine similarities at once.  Real
+conflicts veto a pair: differing gross totals, or invoice numbers whose
+trailing digit runs have the same length but differ – suppliers number
+their invoices sequentially, so "RE-2024-001" and "RE-2024-002" are
+different invoices, while "RE-2024-001" vs "2024001" or a dropped digit
+are extraction noise.  OCR text is only loaded for members of blocks that
+are actually compared.
+"""
+
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Iterable, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import DuplicateScanState, Invoice, InvoiceDuplicate
+
+# Weights of the two signals in the combined score
+_NUMBER_WEIGHT = 0.6
+_TEXT_WEIGHT = 0.4
+
+# Factor applied when both invoice dates are known but differ (e.g. an
+# extraction error on one copy) – weaker evidence than a number conflict
+_DATE_MISMATCH_FACTOR = 0.9
+
+# Hashed n-gram vector size and OCR prefix length considered
+_VECTOR_DIM = 1 << 12
+_NGRAM = 3
+_OCR_CHARS = 4000
+
+# Blocks larger than this carry almost no signal (e.g. a monthly flat-rate
+# subscription) and would make the comparison quadratic again – skip them.
+_MAX_BLOCK_SIZE = 500
+
+_LEGAL_FORMS = re.compile(r"\b(gmbh|mbh|ag|kg|ohg|ug|e\s?k|co|ltd|inc|llc|sarl|bv|se)\b")
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_TRAILING_DIGITS = re.compile(r"[0-9]+$")
+
+# Characters OCR commonly confuses, folded to one form before comparing IDs
+_OCR_LOOKALIKES = str.maketrans({"o": "0", "i": "1", "l": "1", "s": "5", "b": "8", "z": "2"})
+
+# Invoice fields that feed blocking or scoring – edits to others cannot change pairs
+MATCH_FIELDS = frozenset({"supplier_name", "invoice_number", "invoice_date", "gross_total", "ocr_text"})
+
+# Structured columns only – OCR text is fetched separately per compared block
+_COLUMNS = (
+    Invoice.id,
+    Invoice.supplier_name,
+    Invoice.invoice_number,
+    Invoice.invoice_date,
+    Invoice.gross_total,
+)
+
+
+def _normalize(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode()
+    return _NON_ALNUM.sub("", value.lower())
+
+
+def normalize_invoice_number(value: Optional[str]) -> str:
+    """Invoice number without punctuation and with OCR look-alike characters folded."""
+    return _normalize(value).translate(_OCR_LOOKALIKES)
+
+
+def normalize_supplier(name: Optional[str]) -> str:
+    """Lower-case supplier name without legal form, accents and punctuation."""
+    if not name:
+        return ""
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    return _NON_ALNUM.sub("", _LEGAL_FORMS.sub(" ", name))
+
+
+def blocking_keys(row: Any) -> list[tuple]:
+    """Blocking keys of one invoice row – one per pair of known structured fields."""
+    supplier = normalize_supplier(row.supplier_name)
+    keys: list[tuple] = []
+    if supplier and row.gross_total is not None:
+        keys.append(("supplier_amount", supplier, row.gross_total))
+    if supplier and row.invoice_date is not None:
+        keys.append(("supplier_date", supplier, row.invoice_date))
+    if row.gross_total is not None and row.invoice_date is not None:
+        keys.append(("amount_date", row.gross_total, row.invoice_date))
+    return keys
+
+
+def build_blocks(rows: Iterable[Any], focus_ids: Optional[set[int]] = None) -> list[list[Any]]:
+    """Group rows by blocking key; keep comparable blocks (with a focus id, if given)."""
+    blocks: dict[tuple, list[Any]] = defaultdict(list)
+    for row in rows:
+        for key in blocking_keys(row):
+            blocks[key].append(row)
+
+    return [
+        members
+        for members in blocks.values()
+        if 2 <= len(members) <= _MAX_BLOCK_SIZE
+        and (focus_ids is None or any(m.id in focus_ids for m in members))
+    ]
+
+
+def _ngram_matrix(texts: Sequence[str]) -> np.ndarray:
+    """L2-normalized hashed trigram count vectors, one row per text (zero row if empty)."""
+    matrix = np.zeros((len(texts), _VECTOR_DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+        # Texts shorter than one n-gram count as a single gram
+        grams = (text[j:j + _NGRAM] for j in range(max(1, len(text) - _NGRAM + 1)))
+        hashes = [zlib.crc32(g.encode()) % _VECTOR_DIM for g in grams]
+        matrix[i] = np.bincount(hashes, minlength=_VECTOR_DIM)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def _conflicts(values: Sequence[Any]) -> np.ndarray:
+    """Pairwise mask: both values known and different."""
+    arr = np.array(values, dtype=object)
+    known = np.array([v is not None and v != "" for v in values])
+    return np.outer(known, known) & (arr[:, None] != arr[None, :])
+
+
+def _sequence_conflicts(numbers: Sequence[str]) -> np.ndarray:
+    """
+    Pairwise mask of invoice numbers that are different members of a sequence.
+
+    Both trailing digit runs are known, equally long and differ ("…001" vs
+    "…002").  Runs of different length (dropped digit, prefix read as part
+    of the number) are left to the fuzzy score.
+    """
+    tails = []
+    for number in numbers:
+        match = _TRAILING_DIGITS.search(number)
+        tails.append(match.group() if match else None)
+    lengths = np.array([len(t) if t else -1 for t in tails])
+    same_length = (lengths[:, None] == lengths[None, :]) & (lengths[:, None] > 0)
+    return same_length & _conflicts(tails)
+
+
+def _score_block(rows: Sequence[Any], ocr_texts: dict[int, Optional[str]]) -> np.ndarray:
+    """Pairwise similarity matrix (0–1) for the rows of one block."""
+    numbers = [normalize_invoice_number(r.invoice_number) for r in rows]
+    texts = [_normalize((ocr_texts.get(r.id) or "")[:_OCR_CHARS]) for r in rows]
+
+    num_vec = _ngram_matrix(numbers)
+    text_vec = _ngram_matrix(texts)
+    num_sim = num_vec @ num_vec.T
+    text_sim = text_vec @ text_vec.T
+
+    # Only weigh a signal where both sides actually have a value
+    has_num = np.array([bool(n) for n in numbers])
+    has_text = np.array([bool(t) for t in texts])
+    num_w = _NUMBER_WEIGHT * np.outer(has_num, has_num)
+    text_w = _TEXT_WEIGHT * np.outer(has_text, has_text)
+
+    weight = num_w + text_w
+    score = np.zeros_like(text_sim)
+    np.divide(num_w * num_sim + text_w * text_sim, weight, out=score, where=weight > 0)
+
+    score[_sequence_conflicts(numbers)] = 0.0
+    score[_conflicts([r.gross_total for r in rows])] = 0.0
+    score[_conflicts([r.invoice_date for r in rows])] *= _DATE_MISMATCH_FACTOR
+    return np.clip(score, 0.0, 1.0)
+
+
+def find_duplicates(
+    blocks: Sequence[Sequence[Any]],
+    ocr_texts: dict[int, Optional[str]],
+    focus_ids: Optional[set[int]] = None,
+    threshold: Optional[float] = None,
+) -> dict[tuple[int, int], float]:
+    """
+    Score candidate pairs within blocks.
+
+    Returns ``{(newer_id, older_id): score}`` for pairs at or above the
+    threshold.  With `focus_ids`, only pairs involving at least one of those
+    invoices are returned (incremental mode).
+    """
+    if threshold is None:
+        threshold = settings.duplicate_threshold
+
+    pairs: dict[tuple[int, int], float] = {}
+    for members in blocks:
+        score = _score_block(members, ocr_texts)
+        # Vetoed pairs (score 0) are never candidates, whatever the threshold
+        hits = (score >= threshold) & (score > 0)
+        for i, j in zip(*np.nonzero(np.triu(hits, k=1))):
+            a, b = members[i].id, members[j].id
+            if focus_ids is not None and a not in focus_ids and b not in focus_ids:
+                continue
+            pair = (max(a, b), min(a, b))
+            pairs[pair] = max(pairs.get(pair, 0.0), round(float(score[i, j]), 3))
+    return pairs
+
+
+def load_block_rows(db: Session, invoices: Sequence[Any]) -> list[Any]:
+    """
+    Load the structured columns of every invoice that can share a block with `invoices`.
+
+    Every blocking key contains the gross total or the invoice date, so
+    filtering on those two columns yields a superset of all block members.
+    """
+    amounts = {inv.gross_total for inv in invoices if inv.gross_total is not None}
+    dates = {inv.invoice_date for inv in invoices if inv.invoice_date is not None}
+    if not amounts and not dates:
+        return list(invoices)
+
+    conditions = []
+    if amounts:
+        conditions.append(Invoice.gross_total.in_(amounts))
+    if dates:
+        conditions.append(Invoice.invoice_date.in_(dates))
+
+    return db.query(*_COLUMNS).filter(or_(*conditions)).all()
+
+
+def _load_ocr_texts(db: Session, blocks: Sequence[Sequence[Any]]) -> dict[int, Optional[str]]:
+    """OCR text prefixes of all block members."""
+    ids = {m.id for members in blocks for m in members}
+    if not ids:
+        return {}
+    rows = (
+        db.query(Invoice.id, func.left(Invoice.ocr_text, _OCR_CHARS))
+        .filter(Invoice.id.in_(ids))
+        .all()
+    )
+    return {invoice_id: text for invoice_id, text in rows}
+
+
+def _find_for(db: Session, invoices: Sequence[Any]) -> tuple[list[Any], dict[tuple[int, int], float]]:
+    """Candidate rows and scored pairs involving `invoices`."""
+    focus_ids = {inv.id for inv in invoices}
+    rows = load_block_rows(db, invoices)
+    blocks = build_blocks(rows, focus_ids)
+    pairs = find_duplicates(blocks, _load_ocr_texts(db, blocks), focus_ids=focus_ids)
+    return rows, pairs
+
+
+def candidates_for(db: Session, invoice_id: int) -> list[tuple[Any, float]]:
+    """Live duplicate candidates of one invoice, best match first."""
+    target = db.query(*_COLUMNS).filter(Invoice.id == invoice_id).first()
+    if target is None:
+        return []
+
+    rows, pairs = _find_for(db, [target])
+    by_id = {r.id: r for r in rows}
+
+    result = []
+    for (a, b), score in pairs.items():
+        other = b if a == invoice_id else a
+        result.append((by_id[other], score))
+    result.sort(key=lambda item: item[1], reverse=True)
+    return result
+
+
+def rescan(db: Session, invoices: Sequence[Any]) -> int:
+    """
+    Replace the stored pairs of `invoices` with freshly computed ones.
+
+    Does not commit, so callers can run it in the transaction that changed
+    the invoices.  Returns the number of pairs stored.
+    """
+    ids = [inv.id for inv in invoices]
+    if not ids:
+        return 0
+
+    _, pairs = _find_for(db, invoices)
+    db.query(InvoiceDuplicate).filter(
+        or_(InvoiceDuplicate.invoice_id.in_(ids), InvoiceDuplicate.duplicate_of_id.in_(ids))
+    ).delete(synchronize_session=False)
+    if pairs:
+        stmt = insert(InvoiceDuplicate).values([
+            {"invoice_id": a, "duplicate_of_id": b, "score": score}
+            for (a, b), score in pairs.items()
+        ])
+        db.execute(stmt.on_duplicate_key_update(score=stmt.inserted.score))
+    return len(pairs)
+
+
+def rescan_invoice(db: Session, invoice_id: int) -> int:
+    """Re-evaluate the stored pairs of one (edited) invoice; see `rescan`."""
+    row = db.query(*_COLUMNS).filter(Invoice.id == invoice_id).first()
+    return rescan(db, [row]) if row is not None else 0
+
+
+def scan_new(db: Session, batch_size: int = 200) -> tuple[int, int, int]:
+    """
+    Incrementally scan new and changed invoices and store the pairs found.
+
+    New invoices are found by id, invoices changed since the last run (e.g.
+    fields filled in later by the workflow) by `updated_at`; the pairs of
+    both are recomputed from scratch.  Returns ``(scanned, found,
+    last_invoice_id)``.  Each batch of new invoices is committed together
+    with the advanced id watermark, so an interrupted scan resumes where it
+    stopped.
+    """
+    state = db.query(DuplicateScanState).filter(DuplicateScanState.id == 1).first()
+    if state is None:
+        state = DuplicateScanState(id=1, last_invoice_id=0)
+        db.add(state)
+
+    # Fix both watermarks' upper bounds before scanning
+    previous_last_id = state.last_invoice_id
+    max_updated: Optional[datetime] = db.query(func.max(Invoice.updated_at)).scalar()
+
+    scanned = found = 0
+    while True:
+        batch = (
+            db.query(*_COLUMNS)
+            .filter(Invoice.id > state.last_invoice_id)
+            .order_by(Invoice.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+
+        found += rescan(db, batch)
+        scanned += len(batch)
+        state.last_invoice_id = batch[-1].id
+        db.commit()
+
+    # Already scanned rows that changed since the last run; on the very first
+    # run every row was just scanned as new, so only the watermark is set.
+    if state.last_updated_at is not None and max_updated is not None:
+        changed = (
+            db.query(*_COLUMNS)
+            .filter(
+                Invoice.id <= previous_last_id,
+                Invoice.updated_at > state.last_updated_at,
+                Invoice.updated_at <= max_updated,
+            )
+            .order_by(Invoice.id)
+            .all()
+        )
+        for start in range(0, len(changed), batch_size):
+            batch = changed[start:start + batch_size]
+            found += rescan(db, batch)
+            scanned += len(batch)
+            db.commit()
+
+    if max_updated is not None:
+        state.last_updated_at = max_updated
+    db.commit()
+    return scanned, found, state.last_invoice_id
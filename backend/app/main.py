@@ -5,7 +5,8 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.security import ApiKeyMiddleware
-from app.routers import documents, suppliers
+from app.serialization import JSONGZipMiddleware
+from app.routers import documents, duplicates, history, suppliers
 
 app = FastAPI(
     title="Invoice Viewer API",
@@ -26,9 +27,14 @@ app.add_middleware(
 # ── Optional API-Key guard ───────────────────────────────
 app.add_middleware(ApiKeyMiddleware)
 
+# ── Response compression (negotiated via Accept-Encoding) ─
+app.add_middleware(JSONGZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # ── Routers ──────────────────────────────────────────────
 app.include_router(documents.router)
 app.include_router(suppliers.router)
+app.include_router(duplicates.router)
+app.include_router(history.router)
 
 
 # ── Health check ─────────────────────────────────────────
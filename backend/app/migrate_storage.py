@@ -0,0 +1,197 @@
+"""Offline migration of PDF_ROOT into the sharded, content-addressed layout.
+
+Moves every file referenced by an invoice to ``ab/cd/<sha256><ext>`` and
+rewrites ``invoices.pdf_path`` to the new relative path, one batch per
+transaction.  The run is resumable: the last processed invoice id is kept in
+a state file, and files already in place are skipped, so it can be
+interrupted and restarted at any time.
+
+A file is only moved after its content has been hashed and matches
+``invoices.pdf_sha256``; invoices without such a file are reported and
+left untouched.
+
+Usage (PDF_ROOT must be writable, i.e. not the read-only container mount):
+
+    python -m app.migrate_storage [--batch-size 500] [--dry-run] [--restart]
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Invoice
+from app.storage import (
+    build_basename_index,
+    find_by_sha256,
+    pdf_root,
+    resolve_pdf_path,
+    shard_relative_path,
+)
+
+_STATE_FILE = ".shard_migration_state"
+
+
+def _read_state(path: Path) -> int:
+    try:
+        return int(path.read_text().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _write_state(path: Path, last_id: int) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(str(last_id))
+    os.replace(tmp, path)
+
+
+def _sha256_of(path: Path, cache: dict[Path, Optional[str]]) -> Optional[str]:
+    """SHA-256 of a file's content (None if it vanished), memoized per run."""
+    if path not in cache:
+        try:
+            digest = hashlib.sha256()
+            with path.open("rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b""):
+                    digest.update(chunk)
+            cache[path] = digest.hexdigest()
+        except FileNotFoundError:
+            cache[path] = None
+    return cache[path]
+
+
+def _candidates(inv: Invoice, index: dict[str, list[Path]]) -> list[Path]:
+    """Possible locations of an invoice's file – direct lookups first, then name matches."""
+    found = [
+        resolve_pdf_path(inv.pdf_path, legacy_search=False),
+        find_by_sha256(inv.pdf_sha256, legacy_search=False),
+    ]
+    if inv.pdf_path and inv.pdf_path.strip():
+        found.extend(index.get(Path(inv.pdf_path.strip()).name, []))
+    found.extend(index.get(f"{inv.pdf_sha256}.pdf", []))
+
+    unique: list[Path] = []
+    for path in found:
+        if path is not None and path not in unique:
+            unique.append(path)
+    return unique
+
+
+def _migrate_invoice(
+    inv: Invoice,
+    root: Path,
+    index: dict[str, list[Path]],
+    hashes: dict[Path, Optional[str]],
+    dry_run: bool,
+) -> tuple[Optional[str], Optional[str]]:
+    """
+    Move the file of one invoice into place.
+
+    Returns ``(new_pdf_path, skip_reason)``: the new pdf_path (None if
+    unchanged), or a reason why the invoice was skipped.  Only a file whose
+    content hashes to `inv.pdf_sha256` is ever moved or referenced.
+    """
+    if not inv.pdf_sha256:
+        return None, None
+    sha256 = inv.pdf_sha256.lower()
+
+    candidates = _candidates(inv, index)
+    if not candidates:
+        return None, None
+
+    current = next((p for p in candidates if _sha256_of(p, hashes) == sha256), None)
+    if current is None:
+        return None, "no file with matching SHA-256 content"
+
+    relative = shard_relative_path(sha256, current.suffix or ".pdf")
+    target = root / relative
+
+    if current != target:
+        if target.exists():
+            # Same content already stored – keep it and leave the duplicate
+            # where it is; anything else at that name is not ours to replace.
+            if _sha256_of(target, hashes) != sha256:
+                return None, f"{relative} exists with different content"
+        elif not dry_run:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(current, target)
+            hashes[target] = hashes.pop(current)
+
+    new_path = relative.as_posix()
+    if inv.pdf_path == new_path:
+        return None, None
+    return new_path, None
+
+
+def migrate(batch_size: int = 500, dry_run: bool = False, restart: bool = False) -> tuple[int, int]:
+    """Run the migration and return the number of rewritten and skipped invoice rows."""
+    root = pdf_root()
+    if not root.is_dir():
+        raise SystemExit(f"PDF_ROOT does not exist: {root}")
+
+    state_file = root / _STATE_FILE
+    last_id = 0 if restart else _read_state(state_file)
+    rewritten = skipped = 0
+
+    # One directory walk per run; name matches are verified by content hash
+    print(f"Indexing {root} …")
+    index = build_basename_index(root)
+    hashes: dict[Path, Optional[str]] = {}
+
+    db: Session = SessionLocal()
+    try:
+        while True:
+            batch = (
+                db.query(Invoice)
+                .filter(Invoice.id > last_id)
+                .order_by(Invoice.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+
+            for inv in batch:
+                new_path, skip_reason = _migrate_invoice(inv, root, index, hashes, dry_run)
+                if skip_reason is not None:
+                    print(f"  #{inv.id}: SKIPPED – {skip_reason} (pdf_path={inv.pdf_path!r})")
+                    skipped += 1
+                elif new_path is not None:
+                    print(f"  #{inv.id}: {inv.pdf_path!r} -> {new_path}")
+                    if not dry_run:
+                        inv.pdf_path = new_path
+                    rewritten += 1
+
+            last_id = batch[-1].id
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+                _write_state(state_file, last_id)
+            print(f"Processed up to invoice #{last_id} ({rewritten} rewritten, {skipped} skipped)")
+    finally:
+        db.close()
+
+    if not dry_run:
+        state_file.unlink(missing_ok=True)
+    return rewritten, skipped
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500, help="Invoices per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without moving files")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress and start from the first invoice")
+    args = parser.parse_args(argv)
+
+    rewritten, skipped = migrate(batch_size=args.batch_size, dry_run=args.dry_run, restart=args.restart)
+    print(f"Done – {rewritten} invoice(s) rewritten, {skipped} skipped.")
+    return 1 if skipped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
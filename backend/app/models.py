@@ -5,6 +5,7 @@ from decimal import Decimal
 from typing import Optional
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     Integer,
@@ -17,6 +18,7 @@ from sqlalchemy import (
     Index,
     TIMESTAMP,
 )
+from sqlalchemy.dialects.mysql import DATETIME
 from sqlalchemy.orm import DeclarativeBase
 
 
@@ -57,6 +59,8 @@ class Invoice(Base):
     __table_args__ = (
         Index("idx_supplier_name", "supplier_name"),
         Index("idx_source_email", "source_email"),
+        Index("idx_gross_total", "gross_total"),
+        Index("idx_invoice_date", "invoice_date"),
     )
 
 
@@ -82,3 +86,47 @@ class Datenquelle(Base):
 
     id: int = Column(Integer, primary_key=True, autoincrement=True)
     plattform: str = Column(String(255), nullable=False)
+
+
+class InvoiceDuplicate(Base):
+    """Duplicate candidates found by the detection scan (newer invoice → older invoice)."""
+
+    __tablename__ = "invoice_duplicates"
+
+    invoice_id: int = Column(Integer, primary_key=True)
+    duplicate_of_id: int = Column(Integer, primary_key=True)
+    score: Decimal = Column(DECIMAL(4, 3), nullable=False)
+    detected_at: Optional[datetime] = Column(TIMESTAMP, nullable=True, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_duplicate_of_id", "duplicate_of_id"),
+        Index("idx_score", "score"),
+    )
+
+
+class DuplicateScanState(Base):
+    """Single-row watermarks of the incremental duplicate scan (new ids, changed rows)."""
+
+    __tablename__ = "duplicate_scan_state"
+
+    id: int = Column(Integer, primary_key=True)
+    last_invoice_id: int = Column(Integer, nullable=False, default=0)
+    last_updated_at: Optional[datetime] = Column(TIMESTAMP, nullable=True)
+
+
+class InvoiceHistory(Base):
+    """Append-only change log: one row per changed field of an invoice edit."""
+
+    __tablename__ = "invoice_history"
+
+    id: int = Column(BigInteger, primary_key=True, autoincrement=True)
+    invoice_id: int = Column(Integer, nullable=False)
+    changed_at: datetime = Column(DATETIME(fsp=6), nullable=False)
+    actor: str = Column(String(64), nullable=False)
+    field: str = Column(String(32), nullable=False)
+    old_value: Optional[str] = Column(Text, nullable=True)
+    new_value: Optional[str] = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("idx_invoice_time", "invoice_id", "changed_at"),
+    )
@@ -4,104 +4,58 @@ import mimetypes
 import os
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Any, Literal, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import FileResponse
 from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
+from app.audit import apply_changes
 from app.config import settings
 from app.database import get_db
+from app.duplicates import MATCH_FIELDS, rescan_invoice
 from app.models import Invoice
+from app.security import api_key_identity
+from app.serialization import FastJSONResponse, rows_to_columns, rows_to_records
+from app.storage import find_by_sha256, resolve_pdf_path
 from app.schemas import (
     InvoiceListResponse,
     InvoiceListItem,
+    InvoiceListColumnsResponse,
     InvoiceDetail,
     InvoiceUpdateRequest,
     InvoiceUpdateResponse,
     FileListResponse,
     FileEntry,
+    FileColumnsResponse,
 )
 
 router = APIRouter(prefix="/api", tags=["invoices"])
 
-# Prefix used inside n8n containers – will be stripped when resolving to PDF_ROOT
-_N8N_PREFIX = "/files/invoices/inbox/"
-
-
-def _resolve_pdf_path(raw_path: Optional[str]) -> Optional[Path]:
-    """
-    Resolve a pdf_path value from the database to an actual file on disk.
-
-    The DB stores paths in several formats:
-      1. /files/invoices/inbox/<name>.pdf   (absolute inside n8n container)
-      2. <name>.pdf                          (just the filename)
-      3. Empty string or None                (no PDF)
-
-    PDF_ROOT is mounted to the same directory on the host, so we strip the
-    n8n prefix and look for the file relative to PDF_ROOT.
-    """
-    if not raw_path or not raw_path.strip():
-        return None
-
-    root = Path(settings.pdf_root).resolve()
-
-    # Strip the n8n container prefix if present
-    if raw_path.startswith(_N8N_PREFIX):
-        relative = raw_path[len(_N8N_PREFIX):]
-    elif raw_path.startswith("/"):
-        # Some other absolute path – try the basename
-        relative = Path(raw_path).name
-    else:
-        relative = raw_path
-
-    full = (root / relative).resolve()
-
-    # Guard against path traversal
-    if not str(full).startswith(str(root)):
-        return None
-
-    if full.exists() and full.is_file():
-        return full
-
-    # Fallback: search recursively by basename (files may be in sub-directories)
-    basename = Path(relative).name
-    if basename:
-        matches = list(root.rglob(basename))
-        if matches:
-            return matches[0]
-
-    return None
-
-
-def _find_pdf_by_sha256(sha256: str) -> Optional[Path]:
-    """Try to find a PDF file named <sha256>.pdf in PDF_ROOT (including sub-dirs)."""
-    root = Path(settings.pdf_root).resolve()
-    # Try direct path first
-    candidate = root / f"{sha256}.pdf"
-    if candidate.exists() and candidate.is_file():
-        return candidate
-    # Fallback: search recursively
-    matches = list(root.rglob(f"{sha256}.pdf"))
-    if matches:
-        return matches[0]
-    return None
-
-
 # Supported file extensions (lowercase, with dot)
 _SUPPORTED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png"}
 
+# Field order of the list endpoints (must match InvoiceListItem / FileEntry).
+# Handlers return FastJSONResponse directly, so response_model only documents
+# the two shapes (rows / columns) in OpenAPI and is not applied at runtime.
+_INVOICE_LIST_COLUMNS = tuple(InvoiceListItem.model_fields)
+_FILE_COLUMNS = tuple(FileEntry.model_fields)
+
 
 # ── GET /api/files ───────────────────────────────────────
 
-@router.get("/files", response_model=FileListResponse)
-def list_files(db: Session = Depends(get_db)):
+@router.get("/files", response_model=Union[FileListResponse, FileColumnsResponse])
+def list_files(
+    format: Literal["rows", "columns"] = Query("rows", description="Response shape of `files`"),
+    db: Session = Depends(get_db),
+):
     """List all supported files (PDF + images) in PDF_ROOT with their linked invoice (if any)."""
     root = Path(settings.pdf_root).resolve()
+    shape = rows_to_columns if format == "columns" else rows_to_records
 
     if not root.exists():
-        return FileListResponse(total=0, files=[])
+        return FastJSONResponse({"total": 0, "files": shape(_FILE_COLUMNS, [])})
 
     # Collect all supported files recursively
     all_files: list[Path] = []
@@ -110,10 +64,17 @@ def list_files(db: Session = Depends(get_db)):
     all_files = sorted(all_files, key=lambda p: p.stat().st_mtime, reverse=True)
 
     # Build lookup maps from DB: filename -> invoice, sha256 -> invoice
-    all_invoices = db.query(Invoice).all()
-
-    sha_map: dict[str, Invoice] = {}
-    path_map: dict[str, Invoice] = {}
+    # (only the columns needed for matching – skips loading OCR text etc.)
+    all_invoices = db.query(
+        Invoice.id,
+        Invoice.supplier_name,
+        Invoice.invoice_number,
+        Invoice.pdf_sha256,
+        Invoice.pdf_path,
+    ).all()
+
+    sha_map: dict[str, Any] = {}
+    path_map: dict[str, Any] = {}
     for inv in all_invoices:
         if inv.pdf_sha256:
             sha_map[inv.pdf_sha256] = inv
@@ -124,7 +85,7 @@ def list_files(db: Session = Depends(get_db)):
             if basename:
                 path_map[basename] = inv
 
-    entries: list[FileEntry] = []
+    rows: list[tuple] = []
     for f in all_files:
         stat = f.stat()
         # Use relative path from PDF_ROOT so sub-directory files can be served back
@@ -144,16 +105,16 @@ def list_files(db: Session = Depends(get_db)):
                     inv = candidate_inv
                     break
 
-        entries.append(FileEntry(
-            filename=relative_path,
-            size=stat.st_size,
-            modified=datetime.fromtimestamp(stat.st_mtime),
-            invoice_id=inv.id if inv else None,
-            supplier_name=inv.supplier_name if inv else None,
-            invoice_number=inv.invoice_number if inv else None,
+        rows.append((
+            relative_path,
+            stat.st_size,
+            datetime.fromtimestamp(stat.st_mtime),
+            inv.id if inv else None,
+            inv.supplier_name if inv else None,
+            inv.invoice_number if inv else None,
         ))
 
-    return FileListResponse(total=len(entries), files=entries)
+    return FastJSONResponse({"total": len(rows), "files": shape(_FILE_COLUMNS, rows)})
 
 
 # ── GET /api/files/{filename}/raw ────────────────────────
@@ -195,11 +156,12 @@ def get_file_pdf(filename: str):
 
 # ── GET /api/invoices ────────────────────────────────────
 
-@router.get("/invoices", response_model=InvoiceListResponse)
+@router.get("/invoices", response_model=Union[InvoiceListResponse, InvoiceListColumnsResponse])
 def list_invoices(
     search: Optional[str] = Query(None, description="Search by supplier, invoice number or email"),
     limit: int = Query(50, ge=1, le=500),
     offset: int = Query(0, ge=0),
+    format: Literal["rows", "columns"] = Query("rows", description="Response shape of `invoices`"),
     db: Session = Depends(get_db),
 ):
     query = db.query(Invoice)
@@ -213,31 +175,17 @@ def list_invoices(
         )
 
     total = query.count()
-    invoices = (
+    rows = (
         query
+        .with_entities(*(getattr(Invoice, c) for c in _INVOICE_LIST_COLUMNS))
         .order_by(Invoice.created_at.desc())
         .offset(offset)
         .limit(limit)
         .all()
     )
 
-    return InvoiceListResponse(
-        total=total,
-        invoices=[
-            InvoiceListItem(
-                id=inv.id,
-                supplier_name=inv.supplier_name,
-                invoice_number=inv.invoice_number,
-                invoice_date=inv.invoice_date,
-                net_total=inv.net_total,
-                gross_total=inv.gross_total,
-                currency=inv.currency,
-                source_email=inv.source_email,
-                created_at=inv.created_at,
-            )
-            for inv in invoices
-        ],
-    )
+    shape = rows_to_columns if format == "columns" else rows_to_records
+    return FastJSONResponse({"total": total, "invoices": shape(_INVOICE_LIST_COLUMNS, rows)})
 
 
 # ── GET /api/invoices/{id} ───────────────────────────────
@@ -249,7 +197,7 @@ def get_invoice(invoice_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Invoice not found")
 
     # Check if PDF exists on disk
-    pdf = _resolve_pdf_path(inv.pdf_path) or _find_pdf_by_sha256(inv.pdf_sha256)
+    pdf = resolve_pdf_path(inv.pdf_path) or find_by_sha256(inv.pdf_sha256)
 
     return InvoiceDetail(
         id=inv.id,
@@ -278,7 +226,7 @@ def get_invoice_pdf(invoice_id: int, db: Session = Depends(get_db)):
     if not inv:
         raise HTTPException(status_code=404, detail="Invoice not found")
 
-    pdf = _resolve_pdf_path(inv.pdf_path) or _find_pdf_by_sha256(inv.pdf_sha256)
+    pdf = resolve_pdf_path(inv.pdf_path) or find_by_sha256(inv.pdf_sha256)
 
     if not pdf:
         raise HTTPException(status_code=404, detail="PDF file not found on disk")
@@ -298,6 +246,7 @@ def get_invoice_pdf(invoice_id: int, db: Session = Depends(get_db)):
 def update_invoice(
     invoice_id: int,
     payload: InvoiceUpdateRequest,
+    request: Request,
     db: Session = Depends(get_db),
 ):
     inv = db.query(Invoice).filter(Invoice.id == invoice_id).first()
@@ -308,11 +257,13 @@ def update_invoice(
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields provided")
 
-    count = 0
-    for key, value in update_data.items():
-        if hasattr(inv, key):
-            setattr(inv, key, value)
-            count += 1
+    # Field diffs go into the append-only history in the same transaction
+    count = apply_changes(db, inv, update_data, actor=api_key_identity(request))
+
+    # Edited supplier/date/amount/number/OCR text can create or break duplicate pairs
+    if MATCH_FIELDS.intersection(update_data):
+        db.flush()
+        rescan_invoice(db, inv.id)
 
     db.commit()
 
@@ -0,0 +1,81 @@
+"""Duplicate-invoice detection API endpoints."""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.duplicates import candidates_for, scan_new
+from app.models import Invoice, InvoiceDuplicate
+from app.schemas import (
+    DuplicateCandidate,
+    DuplicateListResponse,
+    DuplicatePair,
+    DuplicateReportResponse,
+    DuplicateScanResponse,
+)
+
+router = APIRouter(prefix="/api", tags=["duplicates"])
+
+
+# ── GET /api/invoices/{id}/duplicates ────────────────────
+
+@router.get("/invoices/{invoice_id}/duplicates", response_model=DuplicateListResponse)
+def get_invoice_duplicates(invoice_id: int, db: Session = Depends(get_db)):
+    """Live duplicate candidates of one invoice, best match first."""
+    if not db.query(Invoice.id).filter(Invoice.id == invoice_id).first():
+        raise HTTPException(status_code=404, detail="Invoice not found")
+
+    candidates = [
+        DuplicateCandidate(
+            invoice_id=row.id,
+            supplier_name=row.supplier_name,
+            invoice_number=row.invoice_number,
+            invoice_date=row.invoice_date,
+            gross_total=row.gross_total,
+            score=score,
+        )
+        for row, score in candidates_for(db, invoice_id)
+    ]
+    return DuplicateListResponse(invoice_id=invoice_id, total=len(candidates), candidates=candidates)
+
+
+# ── GET /api/duplicates ──────────────────────────────────
+
+@router.get("/duplicates", response_model=DuplicateReportResponse)
+def list_duplicates(
+    min_score: float = Query(0.0, ge=0.0, le=1.0),
+    limit: int = Query(500, ge=1, le=5000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    """Batch report of all duplicate pairs stored by the incremental scan."""
+    query = db.query(InvoiceDuplicate).filter(InvoiceDuplicate.score >= min_score)
+    total = query.count()
+    pairs = (
+        query
+        .order_by(InvoiceDuplicate.score.desc(), InvoiceDuplicate.invoice_id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return DuplicateReportResponse(
+        total=total,
+        pairs=[
+            DuplicatePair(
+                invoice_id=p.invoice_id,
+                duplicate_of_id=p.duplicate_of_id,
+                score=p.score,
+                detected_at=p.detected_at,
+            )
+            for p in pairs
+        ],
+    )
+
+
+# ── POST /api/duplicates/scan ────────────────────────────
+
+@router.post("/duplicates/scan", response_model=DuplicateScanResponse)
+def run_duplicate_scan(db: Session = Depends(get_db)):
+    """Scan invoices added since the last run (call after new invoices were inserted)."""
+    scanned, found, last_id = scan_new(db)
+    return DuplicateScanResponse(scanned=scanned, found=found, last_invoice_id=last_id)
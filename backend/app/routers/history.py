@@ -0,0 +1,97 @@
+"""Invoice change history (audit log) API endpoints."""
+
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.audit import invoice_as_of
+from app.database import get_db
+from app.models import Invoice, InvoiceHistory
+from app.schemas import InvoiceHistoryEntry, InvoiceHistoryResponse, InvoiceSnapshot
+
+router = APIRouter(prefix="/api/invoices", tags=["history"])
+
+
+# ── GET /api/invoices/{id}/history ───────────────────────
+
+@router.get("/{invoice_id}/history", response_model=InvoiceHistoryResponse)
+def get_invoice_history(
+    invoice_id: int,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    """Field-level change log of one invoice, newest first."""
+    if not db.query(Invoice.id).filter(Invoice.id == invoice_id).first():
+        raise HTTPException(status_code=404, detail="Invoice not found")
+
+    query = db.query(InvoiceHistory).filter(InvoiceHistory.invoice_id == invoice_id)
+    total = query.count()
+    entries = (
+        query
+        .order_by(InvoiceHistory.changed_at.desc(), InvoiceHistory.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return InvoiceHistoryResponse(
+        invoice_id=invoice_id,
+        total=total,
+        entries=[
+            InvoiceHistoryEntry(
+                id=e.id,
+                changed_at=e.changed_at,
+                actor=e.actor,
+                field=e.field,
+                old_value=e.old_value,
+                new_value=e.new_value,
+            )
+            for e in entries
+        ],
+    )
+
+
+# ── GET /api/invoices/{id}/history/at ────────────────────
+
+@router.get("/{invoice_id}/history/at", response_model=InvoiceSnapshot)
+def get_invoice_at(
+    invoice_id: int,
+    at: datetime = Query(..., description="Point in time (UTC, ISO 8601)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Reconstruct the editable invoice fields as they were at the given point in time.
+
+    Untracked columns (pdf_path, llm_flags, updated_at, …) are not part of
+    the snapshot.  Times before the invoice was created return 404.
+    """
+    inv = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+    if not inv:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+
+    # The log stores naive UTC timestamps
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    # created_at is a TIMESTAMP filled in server local time; UNIX_TIMESTAMP()
+    # yields the absolute instant regardless of the session time zone
+    created_epoch = (
+        db.query(func.unix_timestamp(Invoice.created_at))
+        .filter(Invoice.id == invoice_id)
+        .scalar()
+    )
+    if created_epoch is not None:
+        created_utc = datetime.fromtimestamp(float(created_epoch), timezone.utc).replace(tzinfo=None)
+        if at < created_utc:
+            raise HTTPException(status_code=404, detail="Invoice did not exist at that time")
+
+    state = invoice_as_of(db, inv, at)
+    return InvoiceSnapshot(
+        **state,
+        id=inv.id,
+        at=at,
+        pdf_sha256=inv.pdf_sha256,
+        created_at=inv.created_at,
+    )
@@ -27,6 +27,25 @@ class InvoiceListResponse(BaseModel):
     invoices: list[InvoiceListItem]
 
 
+class InvoiceListColumns(BaseModel):
+    """Columnar form of `InvoiceListItem` – one list per field (`format=columns`)."""
+
+    id: list[int]
+    supplier_name: list[str]
+    invoice_number: list[Optional[str]]
+    invoice_date: list[Optional[date]]
+    net_total: list[Optional[Decimal]]
+    gross_total: list[Optional[Decimal]]
+    currency: list[Optional[str]]
+    source_email: list[str]
+    created_at: list[Optional[datetime]]
+
+
+class InvoiceListColumnsResponse(BaseModel):
+    total: int
+    invoices: InvoiceListColumns
+
+
 # ── Single invoice detail ────────────────────────────────
 
 class InvoiceDetail(BaseModel):
@@ -102,6 +121,22 @@ class FileListResponse(BaseModel):
     files: list[FileEntry]
 
 
+class FileColumns(BaseModel):
+    """Columnar form of `FileEntry` – one list per field (`format=columns`)."""
+
+    filename: list[str]
+    size: list[int]
+    modified: list[datetime]
+    invoice_id: list[Optional[int]]
+    supplier_name: list[Optional[str]]
+    invoice_number: list[Optional[str]]
+
+
+class FileColumnsResponse(BaseModel):
+    total: int
+    files: FileColumns
+
+
 # ── Supplier by Email ─────────────────────────────────────
 
 class SupplierByEmailItem(BaseModel):
@@ -138,3 +173,68 @@ class DatenquelleItem(BaseModel):
 
 class DatenquelleCreate(BaseModel):
     plattform: str
+
+
+# ── Duplicate detection ───────────────────────────────────
+
+class DuplicateCandidate(BaseModel):
+    invoice_id: int
+    supplier_name: str
+    invoice_number: Optional[str] = None
+    invoice_date: Optional[date] = None
+    gross_total: Optional[Decimal] = None
+    score: float
+
+
+class DuplicateListResponse(BaseModel):
+    invoice_id: int
+    total: int
+    candidates: list[DuplicateCandidate]
+
+
+class DuplicatePair(BaseModel):
+    invoice_id: int
+    duplicate_of_id: int
+    score: Decimal
+    detected_at: Optional[datetime] = None
+
+    model_config = {"from_attributes": True}
+
+
+class DuplicateReportResponse(BaseModel):
+    total: int
+    pairs: list[DuplicatePair]
+
+
+class DuplicateScanResponse(BaseModel):
+    scanned: int
+    found: int
+    last_invoice_id: int
+
+
+# ── Invoice history ───────────────────────────────────────
+
+class InvoiceHistoryEntry(BaseModel):
+    id: int
+    changed_at: datetime
+    actor: str
+    field: str
+    old_value: Optional[str] = None
+    new_value: Optional[str] = None
+
+    model_config = {"from_attributes": True}
+
+
+class InvoiceHistoryResponse(BaseModel):
+    invoice_id: int
+    total: int
+    entries: list[InvoiceHistoryEntry]
+
+
+class InvoiceSnapshot(InvoiceUpdateRequest):
+    """Invoice as of a point in time – only the fields tracked by the history."""
+
+    id: int
+    at: datetime
+    pdf_sha256: str
+    created_at: Optional[datetime] = None
@@ -1,5 +1,7 @@
 """Optional API-Key middleware."""
 
+import hashlib
+
 from fastapi import Request, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
 
@@ -19,3 +21,18 @@ class ApiKeyMiddleware(BaseHTTPMiddleware):
                 if key != settings.api_key:
                     raise HTTPException(status_code=401, detail="Invalid or missing API key")
         return await call_next(request)
+
+
+def api_key_identity(request: Request) -> str:
+    """
+    Identity of the caller for the audit log.
+
+    Only a key the middleware has validated counts: without API_KEY every
+    caller is "anonymous", whatever header it sends.  With API_KEY set,
+    the identity is a short SHA-256 fingerprint of the key (the key itself
+    is never stored) – a single shared key means one identity for all
+    callers.
+    """
+    if not settings.api_key:
+        return "anonymous"
+    return "key:" + hashlib.sha256(settings.api_key.encode()).hexdigest()[:16]
@@ -0,0 +1,76 @@
+"""Fast JSON responses for large list endpoints.
+
+Handlers return plain dicts/lists built straight from query rows and wrap
+them in `FastJSONResponse`, which serializes with orjson instead of
+re-validating through the Pydantic response model.  The output format is
+the same as Pydantic's JSON mode (Decimals as strings, ISO dates).
+`JSONGZipMiddleware` compresses them when the client accepts gzip.
+"""
+
+import logging
+import time
+from decimal import Decimal
+from typing import Any, Iterable, Sequence
+
+import orjson
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+def _default(obj: Any) -> Any:
+    # Pydantic serializes Decimal as string – keep the wire format unchanged
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    orjson-backed JSON response.
+
+    Serialization time and payload size (before compression) are reported
+    in the `Server-Timing` header and logged at DEBUG level.
+    """
+
+    def __init__(self, content: Any, *args, **kwargs) -> None:
+        self._serialize_ms = 0.0
+        super().__init__(content, *args, **kwargs)
+        self.headers.append(
+            "Server-Timing",
+            f'serialize;dur={self._serialize_ms:.2f};desc="{len(self.body)} bytes"',
+        )
+        logger.debug("Serialized %d bytes in %.2f ms", len(self.body), self._serialize_ms)
+
+    def render(self, content: Any) -> bytes:
+        start = time.perf_counter()
+        body = orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        self._serialize_ms = (time.perf_counter() - start) * 1000
+        return body
+
+
+def rows_to_records(columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> list[dict[str, Any]]:
+    """Row-oriented shape: ``[{col: value, ...}, ...]``."""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def rows_to_columns(columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> dict[str, list[Any]]:
+    """Columnar shape: ``{col: [value, ...], ...}`` – each key is sent only once."""
+    transposed = list(zip(*rows))
+    if not transposed:
+        return {name: [] for name in columns}
+    return {name: list(values) for name, values in zip(columns, transposed)}
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    """GZip middleware that leaves already-compressed file downloads (PDF, images) alone."""
+
+    _SKIP_SUFFIXES = ("/raw", "/pdf")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].endswith(self._SKIP_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
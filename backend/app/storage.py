@@ -0,0 +1,166 @@
+"""PDF_ROOT storage layout and file lookup.
+
+Files are stored content-addressed and sharded by the first two byte pairs
+of their SHA-256 so that no single directory grows unbounded:
+
+    <PDF_ROOT>/ab/cd/abcd…<sha256>.pdf
+
+Older files still live flat in the inbox (or in ad-hoc sub-directories)
+until `python -m app.migrate_storage` has moved them, so lookups also try
+the legacy flat location and – while PDF_LEGACY_SEARCH is on – any
+sub-directory.  The latter goes through a file-name index of PDF_ROOT that
+is cached and rebuilt at most every PDF_LEGACY_INDEX_TTL seconds, instead
+of walking the tree on every request.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+
+# Prefix used inside n8n containers – will be stripped when resolving to PDF_ROOT
+_N8N_PREFIX = "/files/invoices/inbox/"
+
+# Number of two-character directory levels in the sharded layout
+SHARD_DEPTH = 2
+
+
+def pdf_root() -> Path:
+    """Return the resolved PDF_ROOT directory."""
+    return Path(settings.pdf_root).resolve()
+
+
+def shard_relative_path(sha256: str, suffix: str = ".pdf") -> Path:
+    """Return the sharded path of a file relative to PDF_ROOT, e.g. ``ab/cd/<sha>.pdf``."""
+    sha256 = sha256.lower()
+    parts = [sha256[i * 2:i * 2 + 2] for i in range(SHARD_DEPTH)]
+    return Path(*parts, f"{sha256}{suffix.lower()}")
+
+
+def _within_root(path: Path, root: Path) -> bool:
+    """Guard against path traversal."""
+    return str(path).startswith(str(root))
+
+
+def resolve_pdf_path(raw_path: Optional[str], legacy_search: Optional[bool] = None) -> Optional[Path]:
+    """
+    Resolve a pdf_path value from the database to an actual file on disk.
+
+    The DB stores paths in several formats:
+      1. /files/invoices/inbox/<name>.pdf   (absolute inside n8n container)
+      2. <name>.pdf or ab/cd/<sha>.pdf       (relative to PDF_ROOT)
+      3. Empty string or None                (no PDF)
+
+    PDF_ROOT is mounted to the same directory on the host, so we strip the
+    n8n prefix and look for the file relative to PDF_ROOT.  `legacy_search`
+    overrides the PDF_LEGACY_SEARCH setting.
+    """
+    if not raw_path or not raw_path.strip():
+        return None
+
+    root = pdf_root()
+
+    # Strip the n8n container prefix if present
+    if raw_path.startswith(_N8N_PREFIX):
+        relative = raw_path[len(_N8N_PREFIX):]
+    elif raw_path.startswith("/"):
+        # Some other absolute path – try the basename
+        relative = Path(raw_path).name
+    else:
+        relative = raw_path
+
+    full = (root / relative).resolve()
+
+    if not _within_root(full, root):
+        return None
+
+    if full.exists() and full.is_file():
+        return full
+
+    # Content-addressed names can be located without a directory scan
+    basename = Path(relative).name
+    stem = Path(basename).stem
+    if _looks_like_sha256(stem):
+        sharded = root / shard_relative_path(stem, Path(basename).suffix)
+        if sharded.is_file():
+            return sharded
+
+    # Legacy fallback: files may be in ad-hoc sub-directories
+    if legacy_search is None:
+        legacy_search = settings.pdf_legacy_search
+    if basename and legacy_search:
+        return _legacy_lookup(root, basename)
+
+    return None
+
+
+def find_by_sha256(sha256: str, legacy_search: Optional[bool] = None) -> Optional[Path]:
+    """Find the PDF named <sha256>.pdf – sharded layout first, then legacy locations."""
+    if not sha256:
+        return None
+    root = pdf_root()
+
+    for candidate in (
+        root / shard_relative_path(sha256),
+        root / f"{sha256}.pdf",
+    ):
+        if candidate.is_file():
+            return candidate
+
+    # Legacy fallback: files not yet migrated may be in any sub-directory
+    if legacy_search is None:
+        legacy_search = settings.pdf_legacy_search
+    if legacy_search:
+        return _legacy_lookup(root, f"{sha256}.pdf")
+    return None
+
+
+def build_basename_index(root: Path) -> dict[str, list[Path]]:
+    """Map every file name below `root` to all paths carrying it (one directory walk)."""
+    index: dict[str, list[Path]] = defaultdict(list)
+    for path in root.rglob("*"):
+        if path.is_file():
+            index[path.name].append(path)
+    return index
+
+
+_legacy_index: dict[str, list[Path]] = {}
+_legacy_index_root: Optional[Path] = None
+_legacy_index_built = 0.0
+_legacy_index_lock = threading.Lock()
+
+
+def _legacy_lookup(root: Path, basename: str) -> Optional[Path]:
+    """Find `basename` anywhere below `root` via the cached file-name index."""
+    global _legacy_index, _legacy_index_root, _legacy_index_built
+
+    with _legacy_index_lock:
+        if _legacy_index_root == root:
+            # Entries may be outdated (e.g. file moved by the migration)
+            for path in _legacy_index.get(basename, ()):
+                if path.is_file():
+                    return path
+            # Rebuild on a miss only, at most once per TTL
+            if time.monotonic() - _legacy_index_built < settings.pdf_legacy_index_ttl:
+                return None
+
+        _legacy_index = build_basename_index(root)
+        _legacy_index_root = root
+        _legacy_index_built = time.monotonic()
+        for path in _legacy_index.get(basename, ()):
+            if path.is_file():
+                return path
+    return None
+
+
+def _looks_like_sha256(value: str) -> bool:
+    if len(value) != 64:
+        return False
+    try:
+        int(value, 16)
+    except ValueError:
+        return False
+    return True
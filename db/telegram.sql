@@ -0,0 +1,36 @@
+-- Additional tables of the invoice viewer in the existing `telegram` database.
+-- The `invoices` table itself is owned by the n8n workflow.
+-- Run once: mysql -u root -p telegram < db/telegram.sql
+
+-- Blocking lookups of the duplicate detection filter on these columns
+CREATE INDEX IF NOT EXISTS idx_gross_total ON invoices (gross_total);
+CREATE INDEX IF NOT EXISTS idx_invoice_date ON invoices (invoice_date);
+
+CREATE TABLE IF NOT EXISTS invoice_duplicates (
+  invoice_id      INT           NOT NULL,
+  duplicate_of_id INT           NOT NULL,
+  score           DECIMAL(4,3)  NOT NULL,
+  detected_at     TIMESTAMP     NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (invoice_id, duplicate_of_id),
+  INDEX idx_duplicate_of_id (duplicate_of_id),
+  INDEX idx_score (score)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS duplicate_scan_state (
+  id              INT NOT NULL PRIMARY KEY,
+  last_invoice_id INT NOT NULL DEFAULT 0,
+  last_updated_at TIMESTAMP NULL DEFAULT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Append-only audit log of invoice edits (one row per changed field).
+-- Never UPDATE or DELETE rows here; compressed rows keep millions of entries small.
+CREATE TABLE IF NOT EXISTS invoice_history (
+  id          BIGINT       NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  invoice_id  INT          NOT NULL,
+  changed_at  DATETIME(6)  NOT NULL,
+  actor       VARCHAR(64)  NOT NULL,
+  field       VARCHAR(32)  NOT NULL,
+  old_value   TEXT         NULL,
+  new_value   TEXT         NULL,
+  INDEX idx_invoice_time (invoice_id, changed_at)
+) ENGINE=InnoDB ROW_FORMAT=COMPRESSED DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;